@@ -1,21 +1,40 @@
+from __future__ import annotations
+
 import os
+import re
+import string
+import logging
+import asyncio
+import time
+import weakref
 import discord
 from discord.ext import commands
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 from dotenv import load_dotenv
 import openai
 import aiohttp
+from aiolimiter import AsyncLimiter
+from rapidfuzz import fuzz, process
 from datetime import datetime
 __version__ = "0.1.1"
 
+log = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-# Configure OpenAI
-openai.api_key = OPENAI_API_KEY
+# One OpenAI client keeps its connection pool warm across questions. It is
+# created on first use so a missing API key only breaks ChatGPT replies.
+_openai_client = None
+
+def _get_openai_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
 
 # Initialize bot with intents
 intents = discord.Intents.default()
@@ -23,7 +42,59 @@ intents.message_content = True
 intents.messages = True
 intents.guilds = True
 intents.guild_messages = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+
+class PhishBot(commands.Bot):
+    """Bot that owns the shared HTTP clients and closes them on shutdown"""
+
+    http_session: aiohttp.ClientSession | None = None
+    mention_re: re.Pattern | None = None
+    phish_sem: asyncio.Semaphore | None = None
+
+    async def setup_hook(self):
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=60),
+            headers={"User-Agent": f"phish-discord-bot/{__version__}"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+        # Matches both <@id> and nickname-style <@!id> mentions of the bot.
+        # login() has set self.user by now, and messages can arrive before on_ready
+        self.mention_re = re.compile(rf'<@!?{self.user.id}>')
+        # Before Python 3.10 a semaphore binds to the loop current at creation,
+        # so it is made here, inside the loop bot.run() starts
+        self.phish_sem = asyncio.Semaphore(_PHISH_CONCURRENCY)
+
+    async def close(self):
+        if self.http_session is not None:
+            await self.http_session.close()
+        if _openai_client is not None:
+            await _openai_client.close()
+        await super().close()
+
+
+bot = PhishBot(command_prefix='!', intents=intents)
+
+# Parsed setlists are cached per band for this many seconds
+_SETLIST_TTL = 120
+# band -> (fetched_at, data, etag, last_modified)
+_setlist_cache: dict[str, tuple[float, dict, str | None, str | None]] = {}
+# Locks live only while some caller holds them, so arbitrary band names
+# passed to !setlist don't accumulate here
+_setlist_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+# After a failed refresh, phish.net isn't asked again for this many seconds
+_SETLIST_RETRY_AFTER = 30
+# band -> (failed_at, error message) for recently failed refreshes
+_setlist_failures: dict[str, tuple[float, str]] = {}
+# Only the setlist blocks are built into the soup; the rest of the page is skipped
+_SETLIST_STRAINER = SoupStrainer('div', class_='setlist')
+# Songs within a set are separated by commas, segues (->) or transitions (>)
+_SONG_SPLIT_RE = re.compile(r'\s*->\s*|\s*>\s*|,\s*')
+# Cap concurrent and per-minute requests to phish.net
+_PHISH_CONCURRENCY = 4
+_PHISH_RL = AsyncLimiter(max_rate=30, time_period=60)
+# Throttled or server-error responses are retried this many times
+_FETCH_RETRIES = 3
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
 
 async def fetch_latest_setlist(band='phish', last_song_only=False, return_raw=False):
     """Fetch the most recent setlist from phish.net
@@ -36,151 +107,364 @@ async def fetch_latest_setlist(band='phish', last_song_only=False, return_raw=Fa
         str: Formatted setlist text if return_raw is False
         dict: Raw setlist data if return_raw is True
     """
+    data = await _get_setlist_data(band)
+    if isinstance(data, str):
+        return data if not return_raw else None
+    
+    if last_song_only and data['all_songs']:
+        return f"The last song played was **{data['all_songs'][-1]}** on {data['date']} at {data['venue']}"
+    
+    if return_raw:
+        return data
+    return data['formatted_text']
+
+def _lock_for(band):
+    """Return the lock serializing scrapes for a band"""
+    lock = _setlist_locks.get(band)
+    if lock is None:
+        lock = _setlist_locks[band] = asyncio.Lock()
+    return lock
+
+async def _get_setlist_data(band):
+    """Return parsed setlist data for a band, serving it from cache while fresh
+    
+    Concurrent misses for the same band wait on one lock so only a single
+    request goes out to phish.net. If a refresh fails, the last good result
+    (or the error message, when there is none) is served without scraping
+    again for the next _SETLIST_RETRY_AFTER seconds, so callers queued behind
+    a failing scrape don't each repeat it.
+    """
+    cached = _setlist_cache.get(band)
+    if cached and time.monotonic() - cached[0] < _SETLIST_TTL:
+        return cached[1]
+    
+    async with _lock_for(band):
+        # Another caller may have refreshed the entry while we waited
+        cached = _setlist_cache.get(band)
+        if cached and time.monotonic() - cached[0] < _SETLIST_TTL:
+            return cached[1]
+        # Or it may have just failed; don't hit phish.net again straight away
+        failed = _setlist_failures.get(band)
+        if failed and time.monotonic() - failed[0] < _SETLIST_RETRY_AFTER:
+            return cached[1] if cached else failed[1]
+        
+        data, etag, last_modified = await _scrape_setlist(band, cached)
+        now = time.monotonic()
+        if isinstance(data, dict):
+            _setlist_failures.pop(band, None)
+            _setlist_cache[band] = (now, data, etag, last_modified)
+            return data
+        
+        # Drop expired failures so unknown band names don't pile up here
+        for other, (failed_at, _) in list(_setlist_failures.items()):
+            if now - failed_at >= _SETLIST_RETRY_AFTER:
+                del _setlist_failures[other]
+        _setlist_failures[band] = (now, data)
+        if cached:
+            # Serve the stale entry rather than an error; it stays expired so
+            # phish.net is tried again once the retry window passes
+            log.warning("Serving stale setlist for %s: %s", band, data)
+            return cached[1]
+        return data
+
+def _retry_delay(retry_after, attempt):
+    """Seconds to wait before retrying a throttled or failed request
+    
+    Honors a Retry-After header given in seconds, otherwise backs off
+    exponentially; either way the wait is capped at 30 seconds.
+    """
+    if retry_after and retry_after.isdigit():
+        return min(30, int(retry_after))
+    return min(30, 2 ** attempt)
+
+async def _scrape_setlist(band, cached=None):
+    """Download and parse the latest setlist page for a band
+    
+    If a previous cache entry is given, its ETag/Last-Modified validators are
+    sent so an unchanged page comes back as a bodiless 304 and is not re-parsed.
+    
+    Returns:
+        tuple: (data, etag, last_modified), where data is the raw setlist dict
+        or a user-facing error message string
+    """
+    headers = {}
+    if cached:
+        _, _, etag, last_modified = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    
     try:
         base_url = 'https://phish.net/setlists/'
         url = f'{base_url}{band}/' if band else base_url
-        print(f"Fetching setlist from: {url}")
+        log.debug("Fetching setlist from: %s", url)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    print("Got HTML response, looking for setlist...")
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Find the most recent setlist
-                    setlist_div = soup.find('div', class_='setlist')
-                    if not setlist_div:
-                        # Try to find any div that might contain setlist info
-                        print("No div with class 'setlist' found. Looking for alternatives...")
-                        # Print all div classes we find
-                        all_divs = soup.find_all('div')
-                        print("Found these div classes:")
-                        for div in all_divs:
-                            if div.get('class'):
-                                print(f"- {' '.join(div.get('class'))}")
-                        return f"No recent setlist found for {band}."
-                    
-                    # Extract date and venue
-                    print("Looking for date and venue...")
-                    date_span = setlist_div.find('span', class_='setlist-date')
-                    
-                    if not date_span:
-                        print("Couldn't find date span")
-                        return f"Could not parse setlist information for {band}."
-                    
-                    # Parse the date text which is in format "PHISH, DAY MM/DD/YYYY"
-                    date_text = date_span.text.strip()
-                    # Extract raw date
-                    date_raw = date_text.split(',')[1].strip() if ',' in date_text else date_text
-                    # Format date (capitalize day and format month name)
-                    parts = date_raw.split(' ', 1)
-                    if len(parts) == 2:
-                        day = parts[0].capitalize()
-                        try:
-                            dt = datetime.strptime(parts[1], "%m/%d/%Y")
-                            date = f"{day}, {dt.strftime('%B %d, %Y')}"
-                        except ValueError:
-                            date = f"{day} {parts[1]}"
-                    else:
-                        date = date_raw
-                    
-                    # Try to find venue information
-                    venue_heading = setlist_div.find('h4')
-                    venue = ""
-                    if venue_heading:
-                        venue_text = venue_heading.text.strip()
-                        if '@' in venue_text:
-                            venue = venue_text.split('@')[1].strip()
-                
-                # Extract setlist content: process each <p> with a set-label only once
-                print("Looking for setlist content...")
-                import re
-                setlist_dict = {}  # label_text -> songs_text
-                all_songs = []
-                set_paragraphs = setlist_div.find_all('p')
-                for p in set_paragraphs:
-                    # Find all set-label spans in this paragraph
-                    labels = p.find_all('span', class_='set-label')
-                    if not labels:
-                        continue
-                    # Get the full text of the paragraph, with labels as markers
-                    full_text = p.decode_contents()
-                    # Find all set-labels and their positions
-                    label_matches = list(re.finditer(r'<span class="set-label">(.*?)</span>', full_text))
-                    # For each label, extract the text until the next label or end
-                    for i, match in enumerate(label_matches):
-                        label_text = match.group(1).strip()
-                        # Normalize set label capitalization and strip trailing colons
-                        label_clean = label_text.rstrip(':')
-                        norm_label = label_clean.title()
-                        if norm_label in setlist_dict:
-                            continue  # Only first occurrence of each set label
-                        start = match.end()
-                        end = label_matches[i+1].start() if i+1 < len(label_matches) else len(full_text)
-                        # Extract the raw songs HTML and strip tags
-                        songs_html = full_text[start:end]
-                        raw = re.sub('<.*?>', '', songs_html)
-                        raw = raw.replace('&gt;', '>').replace('&amp;', '&')
-                        # Remove any leading colon and whitespace
-                        raw = raw.lstrip(':').strip()
-                        # Split songs on commas, arrows (->), or greater-than (>)
-                        parts = [s.strip() for s in re.split(r'\s*->\s*|\s*>\s*|,\s*', raw) if s.strip()]
-                        # Reconstruct songs text
-                        songs_text = ', '.join(parts)
-                        if parts:
-                            setlist_dict[norm_label] = songs_text
-                            all_songs.extend(parts)
-                # Order: SET 1, SET 2, ... ENCORE
-                setlist_text = [f"{label}: {setlist_dict[label]}" for label in setlist_dict]
-                # Remove duplicate songs while preserving order
-                all_songs = [x for i, x in enumerate(all_songs) if x not in all_songs[:i]]
-                
-                if not setlist_text:
-                    return f"Found setlist for {date} at {venue}, but couldn't parse the songs."
-                
-                if last_song_only and all_songs:
-                    return f"The last song played was **{all_songs[-1]}** on {date} at {venue}"
-                
-                # Format the full response
-                header = f"**{date}**" if not venue else f"**{date} - {venue}**"
-                formatted_text = f"{header}\n\n" + "\n".join(setlist_text)
-                
-                if return_raw:
-                    return {
-                        'date': date,
-                        'venue': venue,
-                        'setlist_dict': setlist_dict,
-                        'all_songs': all_songs,
-                        'formatted_text': formatted_text
-                    }
-                return formatted_text
-                
-        return f"Error accessing {url}" if not return_raw else None
+        for attempt in range(_FETCH_RETRIES + 1):
+            async with bot.phish_sem, _PHISH_RL, bot.http_session.get(url, headers=headers) as response:
+                if response.status not in _RETRY_STATUSES or attempt == _FETCH_RETRIES:
+                    if response.status == 304 and cached:
+                        log.debug("Setlist page not modified, reusing cached data")
+                        return cached[1], cached[2], cached[3]
+                    response.raise_for_status()
+                    html = await response.text(encoding='utf-8', errors='replace')
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    break
+                delay = _retry_delay(response.headers.get('Retry-After'), attempt)
+            # Back off outside the semaphore so other bands can still fetch
+            log.info("phish.net returned %s for %s, retrying in %ss", response.status, url, delay)
+            await asyncio.sleep(delay)
+        
+        log.debug("Got HTML response, looking for setlist...")
+        return _parse_setlist(html, band), etag, last_modified
     
     except Exception as e:
-        print(f"Error fetching setlist: {str(e)}")
-        error_msg = f"Error fetching setlist information for {band}. Please try again later."
-        return error_msg if not return_raw else None
+        log.warning("Error fetching setlist for %s: %s", band, e)
+        return f"Error fetching setlist information for {band}. Please try again later.", None, None
+
+# Curly quotes aren't in string.punctuation but show up in song titles
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation + '‘’“”')
+
+def normalize(s):
+    """Normalize a song title for matching: lowercase, no punctuation, stripped"""
+    return s.lower().translate(_PUNCT_TABLE).strip()
+
+# Common Phish song abbreviations; both sides are normalized so expanded
+# queries compare directly against normalized song names
+_SONG_ABBREVIATIONS = {normalize(k): normalize(v) for k, v in {
+    'yem': 'you enjoy myself',
+    '2001': 'also sprach zarathustra',
+    'moma': 'the moma dance',
+    'hood': 'harry hood',
+    'ctb': 'cars trucks buses',
+    'dwd': 'down with disease',
+    'tweeprise': 'tweezer reprise',
+    'tweezer reprise': 'tweezer reprise',
+    'reba': 'reba',
+    'slave': 'slave to the traffic light',
+    'ghost': 'ghost',
+    'divided sky': 'the divided sky',
+    'bag': 'ac/dc bag',
+    'stash': 'stash',
+    'gin': 'bathtub gin',
+    'halleys': 'halley’s comet',
+    'halley': 'halley’s comet',
+    'mikes': "mike's song",
+    'groove': 'weekapaug groove',
+    'maze': 'maze',
+    'cities': 'cities',
+    'wolfmans': "wolfman's brother",
+    'wolfman': "wolfman's brother",
+    'fee': 'fee',
+    'tweezer': 'tweezer',
+    'piper': 'piper',
+    'antelope': 'run like an antelope',
+    'llama': 'llama',
+    'lizards': 'the lizards',
+}.items()}
+
+def _parse_setlist(html, band):
+    """Parse a phish.net setlist page into raw setlist data
+    
+    Returns:
+        dict: Raw setlist data on success
+        str: A user-facing error message if the page couldn't be parsed
+    """
+    soup = BeautifulSoup(html, 'lxml', parse_only=_SETLIST_STRAINER)
+
+    # Find the most recent setlist
+    setlist_div = soup.find('div', class_='setlist')
+    if not setlist_div:
+        log.warning("setlist div not found for band=%s", band)
+        return f"No recent setlist found for {band}."
+
+    # Extract date and venue
+    log.debug("Looking for date and venue...")
+    date_span = setlist_div.find('span', class_='setlist-date')
+
+    if not date_span:
+        log.debug("Couldn't find date span")
+        return f"Could not parse setlist information for {band}."
+
+    # Parse the date text which is in format "PHISH, DAY MM/DD/YYYY"
+    date_text = date_span.text.strip()
+    # Extract raw date
+    date_raw = date_text.split(',')[1].strip() if ',' in date_text else date_text
+    # Format date (capitalize day and format month name)
+    parts = date_raw.split(' ', 1)
+    if len(parts) == 2:
+        day = parts[0].capitalize()
+        try:
+            dt = datetime.strptime(parts[1], "%m/%d/%Y")
+            date = f"{day}, {dt.strftime('%B %d, %Y')}"
+        except ValueError:
+            date = f"{day} {parts[1]}"
+    else:
+        date = date_raw
+
+    # Try to find venue information
+    venue_heading = setlist_div.find('h4')
+    venue = ""
+    if venue_heading:
+        venue_text = venue_heading.text.strip()
+        if '@' in venue_text:
+            venue = venue_text.split('@')[1].strip()
+
+    # Extract setlist content: process each <p> with a set-label only once
+    log.debug("Looking for setlist content...")
+    setlist_dict = {}  # label_text -> songs_text
+    song_index = []  # (set_label, song, position, normalized song)
+    all_songs = []
+    set_paragraphs = setlist_div.find_all('p')
+    for p in set_paragraphs:
+        # Walk the paragraph's children once, starting a new section at
+        # each set-label span and collecting the text that follows it;
+        # footnote markers (<sup>[1]</sup>) aren't part of the song names
+        sections = []  # (label_text, [text chunks])
+        for child in p.children:
+            if isinstance(child, Tag) and 'set-label' in child.get('class', []):
+                sections.append((child.get_text().strip(), []))
+            elif sections and child.name != 'sup':
+                sections[-1][1].append(child.get_text() if isinstance(child, Tag) else str(child))
+        for label_text, chunks in sections:
+            # Normalize set label capitalization and strip trailing colons
+            label_clean = label_text.rstrip(':')
+            norm_label = label_clean.title()
+            if norm_label in setlist_dict:
+                continue  # Only first occurrence of each set label
+            # Remove any leading colon and whitespace
+            raw = ''.join(chunks).lstrip(':').strip()
+            # Split songs on commas, arrows (->), or greater-than (>)
+            parts = [s.strip() for s in _SONG_SPLIT_RE.split(raw) if s.strip()]
+            # Reconstruct songs text
+            songs_text = ', '.join(parts)
+            if parts:
+                setlist_dict[norm_label] = songs_text
+                all_songs.extend(parts)
+                song_index.extend((norm_label, song, i+1, normalize(song)) for i, song in enumerate(parts))
+    # Order: SET 1, SET 2, ... ENCORE
+    setlist_text = [f"{label}: {setlist_dict[label]}" for label in setlist_dict]
+    # Remove duplicate songs while preserving order
+    all_songs = list(dict.fromkeys(all_songs))
+
+    if not setlist_text:
+        return f"Found setlist for {date} at {venue}, but couldn't parse the songs."
+
+    # Format the full response
+    header = f"**{date}**" if not venue else f"**{date} - {venue}**"
+    formatted_text = f"{header}\n\n" + "\n".join(setlist_text)
+
+    return {
+        'date': date,
+        'venue': venue,
+        'setlist_dict': setlist_dict,
+        'all_songs': all_songs,
+        'formatted_text': formatted_text,
+        'song_index': song_index,
+        'song_names': [norm_song for _, _, _, norm_song in song_index]
+    }
+
+_SYSTEM_MSG = {"role": "system", "content": "You are a knowledgeable assistant focused on Phish-related information."}
+# Longer questions are cut off to bound prompt cost and latency
+_MAX_QUESTION_CHARS = 1000
+
+def _chat_messages(question):
+    """Build the chat message list for a user question"""
+    return [_SYSTEM_MSG, {"role": "user", "content": question[:_MAX_QUESTION_CHARS]}]
 
 async def ask_chatgpt(question):
     """Ask ChatGPT a question"""
     try:
-        client = openai.AsyncOpenAI()
-        response = await client.chat.completions.create(
+        response = await _get_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a knowledgeable assistant focused on Phish-related information."},
-                {"role": "user", "content": question}
-            ]
+            messages=_chat_messages(question)
         )
         return response.choices[0].message.content
     except Exception as e:
         return f"Error: {str(e)}"
 
+# Streamed answers are pushed to Discord after this long or this many new chars
+_STREAM_EDIT_INTERVAL = 0.75
+_STREAM_EDIT_CHARS = 200
+
+async def stream_chatgpt(question, channel):
+    """Stream a ChatGPT answer into a Discord channel
+    
+    The answer is sent once the first tokens arrive and then edited as more
+    stream in, throttled to respect Discord's edit rate limits, with a final
+    edit once the completion finishes.
+    """
+    message = None
+    buffer = ''
+    shown = 0
+    last_edit = time.monotonic()
+    try:
+        stream = await _get_openai_client().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=_chat_messages(question),
+            stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            buffer += delta
+            now = time.monotonic()
+            # Once the first 2000 characters are shown, further edits would
+            # repeat them; the final edit after the stream sends the rest
+            if shown < 2000 and (now - last_edit >= _STREAM_EDIT_INTERVAL or len(buffer) - shown >= _STREAM_EDIT_CHARS):
+                if message is None:
+                    message = await channel.send(buffer[:2000])
+                else:
+                    await message.edit(content=buffer[:2000])
+                shown = min(len(buffer), 2000)
+                last_edit = now
+    except Exception as e:
+        buffer = f"Error: {str(e)}"
+    # A whitespace-only answer would leave no chunks to send
+    first, *rest = chunk_for_discord(buffer.strip() or "Sorry, I didn't get an answer.")
+    if message is None:
+        await channel.send(first)
+    else:
+        await message.edit(content=first)
+    for chunk in rest:
+        await channel.send(chunk)
+
+def chunk_for_discord(text, limit=1990):
+    """Split text into pieces that each fit in one Discord message
+    
+    Pieces break on newlines where possible; a single line longer than the
+    limit is hard-split.
+    """
+    chunks = []
+    current = ''
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += '\n' + line
+        else:
+            chunks.append(current)
+            current = line
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def send_chunked(channel, text):
+    """Send text to a channel, split across as many messages as Discord needs"""
+    for chunk in chunk_for_discord(text):
+        await channel.send(chunk)
+
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
+    log.info('%s has connected to Discord!', bot.user)
 
 @bot.command(name='setlist')
 async def setlist(ctx, band: str = 'phish'):
@@ -192,174 +476,158 @@ async def setlist(ctx, band: str = 'phish'):
         !setlist mike - Get latest Mike setlist
         !setlist tab - Get latest TAB setlist
     """
-    await ctx.send(f"Fetching latest {band.title()} setlist...")
-    setlist_info = await fetch_latest_setlist(band=band.lower())
-    await ctx.send(setlist_info)
+    async with ctx.typing():
+        setlist_info = await fetch_latest_setlist(band=band.lower())
+    await send_chunked(ctx, setlist_info)
 
 @bot.command(name='ask')
 async def ask(ctx, *, question):
     """Ask ChatGPT a Phish-related question"""
-    await ctx.send("Thinking...")
-    response = await ask_chatgpt(question)
-    await ctx.send(response)
+    async with ctx.typing():
+        await stream_chatgpt(question, ctx)
+
+# One pass over a mention finds every keyword; each alternative has a single
+# named group, so match.lastgroup says which intent it belongs to
+_DISPATCH_RE = re.compile(
+    r'\b(?:(?P<lastsong>last song|latest song|most recent song)'
+    # "mike's song" is a Phish song, not a query about Mike's band
+    r"|(?P<band>trey|mike(?!['’]s song)|tab)"
+    r'|(?P<encore>encore)'
+    r'|(?P<didplay>did they play)'
+    r'|set\s*(?P<setnum>\d+))\b'
+)
+# Dispatch groups that mean the mention is about the latest show
+_SETLIST_INTENTS = frozenset({'encore', 'setnum', 'didplay'})
+# Song query parsing for "did they play ..." mentions
+_QUOTED_RE = re.compile(r'"([^"]+)"|\'([^\']+)\'')
+_SONG_CLEAN_RE = re.compile(r'(?:did they |was |were |did |play |played |in set.*|at that show.*|\?)')
+_SONG_QUERY_SPLIT_RE = re.compile(r'\s*(?:or|and|,|/|\&|\|)\s*')
 
 @bot.event
 async def on_message(message):
     """Handle messages that mention the bot"""
-    print(f"Received message: {message.content}")
-    
     # Ignore messages from the bot itself
     if message.author == bot.user:
-        print("Message was from bot, ignoring")
         return
 
     # Process commands normally
     await bot.process_commands(message)
 
-    # Check if the bot was mentioned
-    if bot.user in message.mentions:
-        print(f"Bot was mentioned! Content: {message.content}")
-        content = message.content.lower()
-        
-        # Remove the mention from the content
-        content = content.replace(f'<@{bot.user.id}>', '').strip()
-        
-        # Try to identify the band
-        band = 'phish'  # default to Phish
-        if 'trey' in content:
-            band = 'trey'
-        elif 'mike' in content:
-            band = 'mike'
-        elif 'tab' in content:
-            band = 'tab'
-        
-        # Get the setlist data
-        setlist_data = await fetch_latest_setlist(band=band, return_raw=True)
-        if not setlist_data:
-            await message.channel.send(f"Sorry, I couldn't fetch the setlist for {band}.")
-            return
-
-        # Handle set & encore queries
-        import re
-        requested_key = None
-        # Encore query
-        if 'encore' in content:
-            requested_key = 'Encore'
+    # Nothing else to do unless the bot was mentioned
+    if bot.user not in message.mentions:
+        return
+
+    log.debug("Bot was mentioned! Content: %s", message.content)
+    # Remove the mention from the content
+    content = bot.mention_re.sub('', message.content).lower().strip()
+    
+    reply = await handle_mention(content)
+    await send_chunked(message.channel, reply)
+
+async def handle_mention(content):
+    """Work out the reply to a mention of the bot
+    
+    Args:
+        content (str): The lowercased message text with the mention removed
+    Returns:
+        str: The reply to send back to the channel
+    """
+    # Collect the first match of each keyword kind
+    hits = {}
+    for m in _DISPATCH_RE.finditer(content):
+        hits.setdefault(m.lastgroup, m)
+    
+    # Try to identify the band, defaulting to Phish
+    band = hits['band'].group() if 'band' in hits else 'phish'
+    
+    # Last song queries need only the cached setlist's final song
+    if 'lastsong' in hits:
+        return await fetch_latest_setlist(band=band, last_song_only=True)
+    
+    # Questions without any setlist keyword go straight to ChatGPT, skipping the scrape
+    if '?' in content and not hits.keys() & _SETLIST_INTENTS:
+        return await ask_chatgpt(content)
+    
+    # Get the setlist data
+    setlist_data = await fetch_latest_setlist(band=band, return_raw=True)
+    if not setlist_data:
+        return f"Sorry, I couldn't fetch the setlist for {band}."
+
+    # Handle set & encore queries
+    requested_key = None
+    # Encore query
+    if 'encore' in hits:
+        requested_key = 'Encore'
+    elif 'setnum' in hits:
+        # Set number query, e.g., 'set 2'
+        requested_key = f"Set {hits['setnum'].group('setnum')}"
+    if requested_key and requested_key in setlist_data['setlist_dict']:
+        response = f"**{setlist_data['date']}{' - ' + setlist_data['venue'] if setlist_data['venue'] else ''}**\n\n"
+        response += f"{requested_key}: {setlist_data['setlist_dict'][requested_key]}"
+        return response
+
+    # Check for song queries only if user asked about playing songs
+    if 'didplay' in hits:
+        # Extract quoted songs, or split by 'or', 'and', comma
+        quoted_songs = _QUOTED_RE.findall(content)
+        if quoted_songs:
+            song_queries = [q[0] or q[1] for q in quoted_songs]
         else:
-            # Set number query, e.g., 'set 2'
-            m = re.search(r'set\s*(\d+)', content)
-            if m:
-                requested_key = f"Set {m.group(1)}"
-        if requested_key and requested_key in setlist_data['setlist_dict']:
-            response = f"**{setlist_data['date']}{' - ' + setlist_data['venue'] if setlist_data['venue'] else ''}**\n\n"
-            response += f"{requested_key}: {setlist_data['setlist_dict'][requested_key]}"
-            await message.channel.send(response)
-            return
-
-        # Check for song queries only if user asked about playing songs
-        if re.search(r"\bdid they play\b", content):
-            # existing song query logic...
-            import difflib, string
-            # Extract quoted songs, or split by 'or', 'and', comma
-            quoted_songs = re.findall(r'"([^"]+)"|\'([^\']+)\'', content)
-            if quoted_songs:
-                song_queries = [q[0] or q[1] for q in quoted_songs]
+            # Remove 'did they play', 'was', etc., then split
+            song_section = _SONG_CLEAN_RE.sub('', content)
+            song_queries = _SONG_QUERY_SPLIT_RE.split(song_section)
+            song_queries = [s for s in song_queries if s.strip()]
+        # Songs were split and normalized once when the setlist was parsed
+        song_lookup = setlist_data['song_index']
+        all_song_names = setlist_data['song_names']
+        responses = []
+        for query in song_queries:
+            norm_query = normalize(query)
+            expanded_query = _SONG_ABBREVIATIONS.get(norm_query, norm_query)
+            found = []
+            for set_label, song, pos, norm_song in song_lookup:
+                # Match: exact, abbreviation or substring first
+                if expanded_query == norm_song or expanded_query in norm_song or norm_song in expanded_query:
+                    found.append((set_label, song, pos))
+                # Fuzzy last; a ratio above 80 is impossible unless the length
+                # difference is under half the shorter string, so skip the rest
+                elif (
+                    abs(len(norm_song) - len(expanded_query)) * 2 < min(len(norm_song), len(expanded_query))
+                    and fuzz.ratio(expanded_query, norm_song, score_cutoff=80) > 80
+                ):
+                    found.append((set_label, song, pos))
+            if found:
+                # Group by set
+                sets = {}
+                for set_label, song, pos in found:
+                    sets.setdefault(set_label, []).append(pos)
+                details = []
+                for set_label, positions in sets.items():
+                    pos_str = ', '.join(str(p) for p in positions)
+                    if len(positions) == 1:
+                        details.append(f"{set_label} (song #{positions[0]})")
+                    else:
+                        details.append(f"{set_label} (songs #{pos_str})")
+                responses.append(f"Yes, '{found[0][1]}' was played in {', '.join(details)} on {setlist_data['date']}{' at ' + setlist_data['venue'] if setlist_data['venue'] else ''}.")
             else:
-                # Remove 'did they play', 'was', etc., then split
-                song_section = re.sub(r'(?:did they |was |were |did |play |played |in set.*|at that show.*|\?)', '', content)
-                song_queries = re.split(r'\s*(?:or|and|,|/|\&|\|)\s*', song_section)
-                song_queries = [s for s in song_queries if s.strip()]
-            # Normalize: remove punctuation, lowercase, strip
-            def normalize(s):
-                return ''.join(c for c in s.lower() if c not in string.punctuation).strip()
-            # Expanded Phish abbreviation map
-            abbr = {
-                'yem': 'you enjoy myself',
-                '2001': 'also sprach zarathustra',
-                'moma': 'the moma dance',
-                'hood': 'harry hood',
-                'ctb': 'cars trucks buses',
-                'dwd': 'down with disease',
-                'tweeprise': 'tweezer reprise',
-                'tweezer reprise': 'tweezer reprise',
-                'reba': 'reba',
-                'slave': 'slave to the traffic light',
-                'ghost': 'ghost',
-                'divided sky': 'the divided sky',
-                'bag': 'ac/dc bag',
-                'stash': 'stash',
-                'gin': 'bathtub gin',
-                'halleys': 'halley’s comet',
-                'halley': 'halley’s comet',
-                'mikes': "mike's song",
-                'groove': 'weekapaug groove',
-                'maze': 'maze',
-                'cities': 'cities',
-                'wolfmans': "wolfman's brother",
-                'wolfman': "wolfman's brother",
-                'fee': 'fee',
-                'tweezer': 'tweezer',
-                'piper': 'piper',
-                'antelope': 'run like an antelope',
-                'llama': 'llama',
-                'lizards': 'the lizards',
-            }
-            # Build all normalized song names for fuzzy matching
-            all_song_names = []
-            song_lookup = []  # tuple: (set_label, song, position)
-            for set_label, songs in setlist_data['setlist_dict'].items():
-                for idx, song in enumerate([s.strip() for s in songs.split(',') if s.strip()]):
-                    norm_song = normalize(song)
-                    all_song_names.append(norm_song)
-                    song_lookup.append((set_label, song, idx+1))
-            responses = []
-            for query in song_queries:
-                norm_query = normalize(query)
-                expanded_query = abbr.get(norm_query, norm_query)
-                found = []
-                for set_label, song, pos in song_lookup:
-                    # Match: exact, abbreviation, substring, or fuzzy
-                    if (
-                        expanded_query == normalize(song)
-                        or expanded_query in normalize(song)
-                        or normalize(song) in expanded_query
-                        or difflib.SequenceMatcher(None, expanded_query, normalize(song)).ratio() > 0.8
-                    ):
-                        found.append((set_label, song, pos))
-                if found:
-                    # Group by set
-                    sets = {}
-                    for set_label, song, pos in found:
-                        sets.setdefault(set_label, []).append(pos)
-                    details = []
-                    for set_label, positions in sets.items():
-                        pos_str = ', '.join(str(p) for p in positions)
-                        if len(positions) == 1:
-                            details.append(f"{set_label} (song #{positions[0]})")
-                        else:
-                            details.append(f"{set_label} (songs #{pos_str})")
-                    responses.append(f"Yes, '{found[0][1]}' was played in {', '.join(details)} on {setlist_data['date']}{' at ' + setlist_data['venue'] if setlist_data['venue'] else ''}.")
+                # Suggest closest match
+                close = process.extractOne(expanded_query, all_song_names, scorer=fuzz.ratio, score_cutoff=60)
+                if close:
+                    suggestion = close[0].title()
+                    responses.append(f"No, but did you mean '{suggestion}'?")
                 else:
-                    # Suggest closest match
-                    close = difflib.get_close_matches(expanded_query, all_song_names, n=1, cutoff=0.6)
-                    if close:
-                        suggestion = close[0].title()
-                        responses.append(f"No, but did you mean '{suggestion}'?")
-                    else:
-                        responses.append(f"No, '{query.title()}' wasn't played in the latest show.")
-            for resp in responses:
-                await message.channel.send(resp)
-            return
+                    responses.append(f"No, '{query.title()}' wasn't played in the latest show.")
+        return '\n'.join(responses)
 
-        # If message contains a question mark and no set or song query, fallback to ChatGPT
-        if '?' in content:
-            response = await ask_chatgpt(content)
-            await message.channel.send(response)
-            return
+    # If message contains a question mark and no set or song query, fallback to ChatGPT
+    if '?' in content:
+        return await ask_chatgpt(content)
 
-        # Default to showing full setlist
-        await message.channel.send(setlist_data['formatted_text'])
+    # Default to showing full setlist
+    return setlist_data['formatted_text']
 
 # Run the bot
 if __name__ == "__main__":
-    bot.run(DISCORD_TOKEN)
+    # discord.py's handler goes on the root logger, so the bot's own records
+    # share it and discord's aren't printed a second time
+    bot.run(DISCORD_TOKEN, root_logger=True)
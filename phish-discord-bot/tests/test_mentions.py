@@ -0,0 +1,51 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+for _mod in ('discord', 'bs4', 'lxml', 'dotenv', 'openai', 'aiohttp', 'aiolimiter', 'rapidfuzz'):
+    pytest.importorskip(_mod)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import bot  # noqa: E402
+
+
+def _fake_setlist():
+    songs = [('Set 1', "Mike's Song", 1), ('Set 1', 'Weekapaug Groove', 2), ('Encore', 'Tweezer Reprise', 1)]
+    song_index = [(label, song, pos, bot.normalize(song)) for label, song, pos in songs]
+    return {
+        'date': '2024-08-04',
+        'venue': "Dick's Sporting Goods Park",
+        'setlist_dict': {'Set 1': "Mike's Song, Weekapaug Groove", 'Encore': 'Tweezer Reprise'},
+        'all_songs': [song for _, song, _ in songs],
+        'formatted_text': 'full setlist',
+        'song_index': song_index,
+        'song_names': [norm for _, _, _, norm in song_index],
+    }
+
+
+@pytest.fixture
+def fetched_bands(monkeypatch):
+    bands = []
+
+    async def fake_fetch(band='phish', last_song_only=False, return_raw=False):
+        bands.append(band)
+        return _fake_setlist()
+
+    monkeypatch.setattr(bot, 'fetch_latest_setlist', fake_fetch)
+    return bands
+
+
+@pytest.mark.parametrize('content', ["did they play mike's song", "did they play mike’s song"])
+def test_mikes_song_is_a_phish_song(fetched_bands, content):
+    reply = asyncio.run(bot.handle_mention(content))
+    assert fetched_bands == ['phish']
+    assert reply.startswith("Yes, 'Mike's Song' was played in Set 1 (song #1)")
+
+
+@pytest.mark.parametrize('content', ['mike setlist', 'mike set 1', "mike's setlist", 'mike’s set 1'])
+def test_mike_still_selects_the_band(fetched_bands, content):
+    asyncio.run(bot.handle_mention(content))
+    assert fetched_bands == ['mike']
+
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+for _mod in ('discord', 'bs4', 'lxml', 'dotenv', 'openai', 'aiohttp', 'aiolimiter', 'rapidfuzz'):
+    pytest.importorskip(_mod)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import bot  # noqa: E402
+
+_ERROR = "Error fetching setlist information for phish. Please try again later."
+
+
+@pytest.fixture
+def failing_scrape(monkeypatch):
+    monkeypatch.setattr(bot, '_setlist_cache', {})
+    monkeypatch.setattr(bot, '_setlist_failures', {})
+    calls = []
+
+    async def fake_scrape(band, cached=None):
+        calls.append(band)
+        await asyncio.sleep(0.01)
+        return _ERROR, None, None
+
+    monkeypatch.setattr(bot, '_scrape_setlist', fake_scrape)
+    return calls
+
+
+async def _fetch_concurrently(band, n=5):
+    return await asyncio.gather(*(bot._get_setlist_data(band) for _ in range(n)))
+
+
+def test_failed_refresh_is_not_repeated_by_waiters(failing_scrape):
+    results = asyncio.run(_fetch_concurrently('phish'))
+    assert failing_scrape == ['phish']
+    assert results == [_ERROR] * 5
+
+
+def test_failed_refresh_serves_stale_data_to_waiters(failing_scrape):
+    stale = {'formatted_text': 'stale setlist'}
+    bot._setlist_cache['phish'] = (time.monotonic() - bot._SETLIST_TTL - 1, stale, None, None)
+    results = asyncio.run(_fetch_concurrently('phish'))
+    assert failing_scrape == ['phish']
+    assert all(result is stale for result in results)
+
+
+_SETLIST_HTML = """
+<html><body>
+<div class="setlist">
+  <span class="setlist-date">PHISH, SUNDAY 08/04/2024</span>
+  <h4>Phish @ Dick's Sporting Goods Park</h4>
+  <p class="setlist-body"><span class="set-label">Set 1</span>: <a href="#">Tweezer</a><sup title="Unfinished.">[1]</sup> -&gt;
+  <a href="#">Cars Trucks &amp; Buses</a>, <a href="#">Harry Hood</a>
+  <span class="set-label">Set 2</span>: <a href="#">Down with Disease</a> &gt; <a href="#">Tweezer Reprise</a></p>
+  <p><span class="set-label">Encore</span>: <a href="#">Loving Cup</a></p>
+  <p><span class="set-label">SET 1</span>: <a href="#">Bouncing Around the Room</a></p>
+</div>
+</body></html>
+"""
+
+
+def test_parse_setlist():
+    data = bot._parse_setlist(_SETLIST_HTML, 'phish')
+    assert data['date'] == 'Sunday, August 04, 2024'
+    assert data['venue'] == "Dick's Sporting Goods Park"
+    # Labels sharing a <p> each get their own set, and a repeated label is ignored
+    assert data['setlist_dict'] == {
+        'Set 1': 'Tweezer, Cars Trucks & Buses, Harry Hood',
+        'Set 2': 'Down with Disease, Tweezer Reprise',
+        'Encore': 'Loving Cup',
+    }
+    assert data['all_songs'] == [
+        'Tweezer', 'Cars Trucks & Buses', 'Harry Hood', 'Down with Disease', 'Tweezer Reprise', 'Loving Cup',
+    ]
+    assert [(label, song, pos) for label, song, pos, _ in data['song_index']] == [
+        ('Set 1', 'Tweezer', 1),
+        ('Set 1', 'Cars Trucks & Buses', 2),
+        ('Set 1', 'Harry Hood', 3),
+        ('Set 2', 'Down with Disease', 1),
+        ('Set 2', 'Tweezer Reprise', 2),
+        ('Encore', 'Loving Cup', 1),
+    ]
+    assert data['song_names'] == [norm for _, _, _, norm in data['song_index']]